@@ -5,6 +5,7 @@ from sqlalchemy import create_engine, text
 from datetime import datetime, date
 import plotly.express as px
 import config
+import archive
 
 # ======================
 # DATABASE CONNECTION
@@ -104,8 +105,10 @@ with st.sidebar:
                 WHERE std_transaction_date >= CURRENT_DATE - INTERVAL '7 days'
             """), conn)
             if not qs.empty:
-                st.metric("Records (7d)", f"{qs.iloc[0]['total_records']:,}")
-                st.metric("Sum Amount (7d)", f"{float(qs.iloc[0]['total_amount']):,.2f}")
+                # bulan lalu bisa sudah diarsip di awal bulan
+                q = qs.iloc[0].astype(float) + archive.recent_totals(conn, 7)
+                st.metric("Records (7d)", f"{int(q['total_records']):,}")
+                st.metric("Sum Amount (7d)", f"{float(q['total_amount']):,.2f}")
     except Exception as e:
         st.info(f"Connect to view stats (schema={SCHEMA}). Detail: {e}")
 
@@ -118,41 +121,14 @@ def parse_dates(df: pd.DataFrame, cols):
             df[c] = pd.to_datetime(df[c], errors="coerce")
     return df
 
-def coalesce(a, b):
-    return a if pd.notna(a) else b
-
-def compute_start_end_balance(df: pd.DataFrame):
-    if df.empty or "last_updated" not in df.columns:
-        return None, None
-    tmp = df.copy()
-    tmp = parse_dates(tmp, ["last_updated"])
-    tmp = tmp.sort_values("last_updated")
-    first = tmp.loc[tmp[["balance_after","balance_before"]].notna().any(axis=1)].head(1)
-    last  = tmp.loc[tmp[["balance_after","balance_before"]].notna().any(axis=1)].tail(1)
-    if first.empty or last.empty:
-        return None, None
-    start_val = coalesce(first.iloc[0].get("balance_after"), first.iloc[0].get("balance_before"))
-    end_val   = coalesce(last.iloc[0].get("balance_after"),  last.iloc[0].get("balance_before"))
-    try:
-        start_val = float(start_val) if start_val is not None else None
-        end_val   = float(end_val) if end_val is not None else None
-    except Exception:
-        pass
-    return start_val, end_val
-
-def daily_start_end_table_chained(df: pd.DataFrame):
-    if df.empty or "last_updated" not in df.columns:
-        return pd.DataFrame()
-    d = df.copy()
-    d = parse_dates(d, ["last_updated"])
-    d["lu_date"] = d["last_updated"].dt.date
-    rows = []
-    for dte, group in d.groupby("lu_date", dropna=True):
-        s, e = compute_start_end_balance(group)
-        rows.append({"date": dte, "starting_balance": s, "ending_balance": e})
-    if not rows:
+def daily_start_end_table_chained(df: pd.DataFrame, cold_points: pd.DataFrame = None):
+    """Chain saldo harian; `cold_points` = titik saldo dari arsip (archive.load_balance_points)."""
+    points = archive.daily_balance_points(df)
+    if cold_points is not None:
+        points = archive.merge_balance_points(cold_points, points)
+    if points.empty:
         return pd.DataFrame()
-    out = pd.DataFrame(rows).sort_values("date").reset_index(drop=True)
+    out = points[["date", "starting_balance", "ending_balance"]].sort_values("date").reset_index(drop=True)
     prev_end = None
     for i in range(len(out)):
         if i == 0:
@@ -174,6 +150,33 @@ def safe_sum_by_date(df: pd.DataFrame, col_date: str, value_col: str):
     g.columns = ["date", f"sum_{value_col}"]
     return g.sort_values("date")
 
+def union_rows(*frames: pd.DataFrame):
+    frames = [f for f in frames if not f.empty]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def load_cold_batch(batch_id: int, columns: tuple) -> pd.DataFrame:
+    """Satu batch arsip, hanya kolom yang dipakai. Batch tidak pernah diubah (restore = hapus), jadi aman di-cache per id."""
+    with engine.connect() as conn:
+        return archive.load_batches(conn, [batch_id], list(columns))
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def load_cold_rows(batch_ids: tuple, start, end, columns: tuple, contains: tuple, tz: str) -> pd.DataFrame:
+    """Baris arsip yang sudah difilter; yang di-cache hanya hasil filter, bukan seluruh batch."""
+    needed = tuple(dict.fromkeys(("std_transaction_date",) + columns + tuple(c for c, _ in contains)))
+    parts = [archive.filter_rows(load_cold_batch(b, needed), start, end, dict(contains), tz) for b in batch_ids]
+    return union_rows(*parts).reindex(columns=list(columns))
+
+def read_cold_rows(conn, start, end, columns, contains=None):
+    """Baris arsip untuk rentang tanggal (routing otomatis ke cold store)."""
+    batch_ids = archive.batch_ids_for_range(conn, start, end)
+    if not batch_ids:
+        return pd.DataFrame()
+    contains = tuple((c, v) for c, v in (contains or {}).items() if v)
+    # batas tanggal harus di TimeZone session, sama seperti BETWEEN di query hot
+    tz = archive.session_timezone(conn)
+    return load_cold_rows(tuple(batch_ids), start, end, tuple(columns), contains, tz)
+
 # ======================
 # PAGES
 # ======================
@@ -255,6 +258,15 @@ if st.session_state.current_page == 'Upload Data':
 
                         unique_col = unique_column.lower()
 
+                        # bulan yang sudah diarsip bersifat read-only (restore dulu via archive.py):
+                        # tolak baris bertanggal bulan arsip & key yang sudah diarsip, di semua mode
+                        with engine.connect() as conn:
+                            in_archive = archive.archived_mask(conn, df_upload)
+                        if in_archive.any():
+                            df_upload = df_upload[~in_archive].copy()
+                            st.warning(f"⚠️ Skipped {int(in_archive.sum()):,} row(s) dated in, or keyed to, archived months. "
+                                       "Restore the month with archive.py first.")
+
                         if duplicate_action == "Add All (Allow Duplicates)":
                             with engine.begin() as conn:
                                 df_upload.to_sql("reconciliation", conn, if_exists="append", index=False, schema=SCHEMA)
@@ -373,6 +385,8 @@ elif st.session_state.current_page == 'Analytics':
                 params["u"] = f"%{a_username}%"
 
             df_viz = pd.read_sql(text(query), conn, params=params)
+            df_viz = union_rows(df_viz, read_cold_rows(conn, a_start, a_end, list(df_viz.columns),
+                                                       {"std_username": a_username}))
     except Exception as e:
         st.error(f"❌ Database connection error: {e}")
         df_viz = pd.DataFrame()
@@ -437,9 +451,10 @@ elif st.session_state.current_page == 'Analytics':
                 df_bal = pd.read_sql(text(f"""
                     SELECT last_updated, balance_before, balance_after
                     FROM {tbl('reconciliation')}
-                """), conn)   # <-- tanpa filter sama sekali
+                """), conn)   # <-- tanpa filter sama sekali (bulan yang diarsip via titik saldo)
+                cold_points = archive.load_balance_points(conn)
             df_bal = parse_dates(df_bal, ["last_updated"])
-            dtable = daily_start_end_table_chained(df_bal)
+            dtable = daily_start_end_table_chained(df_bal, cold_points)
         except Exception as e:
             st.error(f"❌ Database error (balance): {e}")
             dtable = pd.DataFrame()
@@ -480,7 +495,7 @@ else:
                 """),
                 conn, params={"s": default_start, "e": default_end}
             )
-            s = summary_df.iloc[0]
+            s = summary_df.iloc[0].astype(float) + archive.summary_totals(conn, default_start, default_end)
     except Exception as e:
         st.error(f"❌ Database connection error (summary): {e}")
         s = pd.Series({"sum_std_amount":0,"sum_std_vendor_cost":0,"sum_std_admin_fee":0,"sum_std_admin_fee_invoice":0})
@@ -548,6 +563,10 @@ else:
     try:
         with engine.connect() as conn:
             df = pd.read_sql(text(base_query), conn, params=params)
+            df = union_rows(df, read_cold_rows(conn, start_date, end_date, list(df.columns), {
+                "std_vendor": f_vendor, "std_identifier": f_identifier,
+                "std_balance_joiner": f_balance_joiner, "std_username": f_username,
+            }))
     except Exception as e:
         st.error(f"❌ Database connection error: {e}")
         df = pd.DataFrame()
@@ -0,0 +1,403 @@
+# archive.py
+"""
+Cold store untuk bulan yang sudah ditutup.
+
+Baris `reconciliation` per bulan (berdasarkan std_transaction_date) dipindah ke
+schema arsip sebagai satu batch Parquet terkompresi (zstd), ditambah:
+  - rollup harian (untuk Summary Metrics),
+  - titik saldo harian by last_updated (untuk chain starting/ending balance),
+  - daftar key (std_identifier / tx_id) supaya upload tidak menduplikasi arsip.
+
+Pemakaian:
+    python archive.py                   # arsipkan bulan yg lebih tua dari ARCHIVE_KEEP_MONTHS
+    python archive.py --before 2025-01  # arsipkan semua bulan sebelum 2025-01
+    python archive.py --restore 2024-03 # kembalikan satu bulan ke tabel utama
+    python archive.py --list
+"""
+import argparse
+import io
+import re
+from datetime import date
+
+import pandas as pd
+import pyarrow.parquet as pq
+from sqlalchemy import create_engine, text
+import config
+
+SCHEMA = getattr(config, "DB_SCHEMA", "public").strip() or "public"
+ARCHIVE_SCHEMA = getattr(config, "ARCHIVE_SCHEMA", f"{SCHEMA}_archive").strip() or f"{SCHEMA}_archive"
+KEEP_MONTHS = int(getattr(config, "ARCHIVE_KEEP_MONTHS", 3))
+
+HOT = f"{SCHEMA}.reconciliation"
+BATCHES = f"{ARCHIVE_SCHEMA}.reconciliation_archive"
+DAILY = f"{ARCHIVE_SCHEMA}.reconciliation_daily"
+BALANCE = f"{ARCHIVE_SCHEMA}.reconciliation_balance"
+KEYS = f"{ARCHIVE_SCHEMA}.reconciliation_keys"
+
+SUMMARY_COLS = ["sum_std_amount", "sum_std_vendor_cost", "sum_std_admin_fee", "sum_std_admin_fee_invoice"]
+BALANCE_COLS = ["date", "first_ts", "starting_balance", "last_ts", "ending_balance"]
+
+DDL = f"""
+CREATE SCHEMA IF NOT EXISTS "{ARCHIVE_SCHEMA}";
+
+-- satu baris per batch arsip; payload = Parquet (zstd) berisi semua kolom
+CREATE TABLE IF NOT EXISTS {BATCHES} (
+    id BIGSERIAL PRIMARY KEY,
+    month DATE NOT NULL,
+    row_count INTEGER NOT NULL,
+    archived_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    payload BYTEA NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_reconciliation_archive_month ON {BATCHES} (month);
+
+-- rollup harian by std_transaction_date::date
+CREATE TABLE IF NOT EXISTS {DAILY} (
+    batch_id BIGINT NOT NULL REFERENCES {BATCHES} (id) ON DELETE CASCADE,
+    month DATE NOT NULL,
+    tx_date DATE NOT NULL,
+    row_count INTEGER NOT NULL,
+    sum_std_amount NUMERIC(18,2) NOT NULL,
+    sum_std_vendor_cost NUMERIC(18,2) NOT NULL,
+    sum_std_admin_fee NUMERIC(18,2) NOT NULL,
+    sum_std_admin_fee_invoice NUMERIC(18,2) NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_reconciliation_daily_tx_date ON {DAILY} (tx_date);
+CREATE INDEX IF NOT EXISTS ix_reconciliation_daily_batch_id ON {DAILY} (batch_id);
+
+-- saldo pertama/terakhir per hari (by last_updated) untuk balance chain
+CREATE TABLE IF NOT EXISTS {BALANCE} (
+    batch_id BIGINT NOT NULL REFERENCES {BATCHES} (id) ON DELETE CASCADE,
+    month DATE NOT NULL,
+    date DATE NOT NULL,
+    first_ts TIMESTAMPTZ,
+    starting_balance NUMERIC(18,2),
+    last_ts TIMESTAMPTZ,
+    ending_balance NUMERIC(18,2)
+);
+CREATE INDEX IF NOT EXISTS ix_reconciliation_balance_batch_id ON {BALANCE} (batch_id);
+
+-- key yang sudah diarsip, dipakai saat cek duplikat upload
+CREATE TABLE IF NOT EXISTS {KEYS} (
+    batch_id BIGINT NOT NULL REFERENCES {BATCHES} (id) ON DELETE CASCADE,
+    month DATE NOT NULL,
+    std_identifier TEXT,
+    tx_id TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_reconciliation_keys_std_identifier ON {KEYS} (std_identifier);
+CREATE INDEX IF NOT EXISTS ix_reconciliation_keys_tx_id ON {KEYS} (tx_id);
+CREATE INDEX IF NOT EXISTS ix_reconciliation_keys_batch_id ON {KEYS} (batch_id);
+"""
+
+# ======================
+# HELPERS
+# ======================
+def month_bounds(month: date):
+    """(awal bulan, awal bulan berikutnya)."""
+    start = month.replace(day=1)
+    end = date(start.year + 1, 1, 1) if start.month == 12 else date(start.year, start.month + 1, 1)
+    return start, end
+
+def parse_month(value: str) -> date:
+    """'2024-03' -> date(2024, 3, 1). Dipakai sebagai `type=` argparse."""
+    if not re.fullmatch(r"\d{4}-\d{2}", value or ""):
+        raise argparse.ArgumentTypeError(f"format bulan harus YYYY-MM, bukan {value!r}")
+    try:
+        return date(int(value[:4]), int(value[5:]), 1)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"bulan tidak valid: {value!r}")
+
+def default_cutoff(today: date = None) -> date:
+    """Awal bulan tertua yang masih disimpan di tabel utama."""
+    today = today or date.today()
+    y, m = today.year, today.month - KEEP_MONTHS
+    while m < 1:
+        y, m = y - 1, m + 12
+    return date(y, m, 1)
+
+def to_parquet_bytes(df: pd.DataFrame) -> bytes:
+    buf = io.BytesIO()
+    df.to_parquet(buf, index=False, compression="zstd")
+    return buf.getvalue()
+
+def from_parquet_bytes(payload, columns=None) -> pd.DataFrame:
+    """Baca payload; `columns` = proyeksi kolom (kolom yang tidak ada di batch diabaikan)."""
+    buf = io.BytesIO(bytes(payload))
+    if columns is not None:
+        present = set(pq.read_schema(buf).names)
+        columns = [c for c in columns if c in present]
+        buf.seek(0)
+    return pd.read_parquet(buf, columns=columns)
+
+def daily_balance_points(df: pd.DataFrame) -> pd.DataFrame:
+    """Per tanggal last_updated: saldo baris pertama & terakhir (balance_after, fallback balance_before).
+
+    Hari tanpa saldo tetap muncul (NaN) supaya chain sama dengan perhitungan langsung.
+    """
+    if df.empty or "last_updated" not in df.columns:
+        return pd.DataFrame(columns=BALANCE_COLS)
+    d = df[["last_updated", "balance_before", "balance_after"]].copy()
+    d["last_updated"] = pd.to_datetime(d["last_updated"], errors="coerce")
+    d = d.dropna(subset=["last_updated"]).sort_values("last_updated")
+    if d.empty:
+        return pd.DataFrame(columns=BALANCE_COLS)
+    d["date"] = d["last_updated"].dt.date
+    d["_bal"] = pd.to_numeric(d["balance_after"].where(d["balance_after"].notna(), d["balance_before"]),
+                              errors="coerce")
+    agg = (d.dropna(subset=["_bal"]).groupby("date")
+            .agg(first_ts=("last_updated", "first"), starting_balance=("_bal", "first"),
+                 last_ts=("last_updated", "last"), ending_balance=("_bal", "last"))
+            .reset_index())
+    days = pd.DataFrame({"date": sorted(d["date"].unique())})
+    return days.merge(agg, on="date", how="left")[BALANCE_COLS]
+
+def merge_balance_points(*frames: pd.DataFrame) -> pd.DataFrame:
+    """Gabung titik saldo dari beberapa sumber: start dari first_ts paling awal, end dari last_ts paling akhir."""
+    frames = [f for f in frames if not f.empty]
+    if not frames:
+        return pd.DataFrame(columns=BALANCE_COLS)
+    p = pd.concat(frames, ignore_index=True)
+    starts = (p.dropna(subset=["first_ts", "starting_balance"]).sort_values("first_ts")
+               .groupby("date").head(1)[["date", "first_ts", "starting_balance"]])
+    ends = (p.dropna(subset=["last_ts", "ending_balance"]).sort_values("last_ts")
+             .groupby("date").tail(1)[["date", "last_ts", "ending_balance"]])
+    days = pd.DataFrame({"date": sorted(p["date"].unique())})
+    out = days.merge(starts, on="date", how="left").merge(ends, on="date", how="left")
+    return out[BALANCE_COLS].sort_values("date").reset_index(drop=True)
+
+def filter_rows(df: pd.DataFrame, start: date, end: date, contains: dict = None, tz: str = "UTC") -> pd.DataFrame:
+    """Versi pandas dari `std_transaction_date BETWEEN :s AND :e AND col ILIKE '%..%'`.
+
+    `tz` = TimeZone session Postgres; :s/:e di SQL berarti tengah malam di zona itu.
+    """
+    if df.empty:
+        return df
+    ts = pd.to_datetime(df["std_transaction_date"], errors="coerce")
+    if ts.dt.tz is None:
+        ts = ts.dt.tz_localize(tz)
+    lo = pd.Timestamp(start).tz_localize(tz, nonexistent="shift_forward")
+    hi = pd.Timestamp(end).tz_localize(tz, nonexistent="shift_forward")
+    mask = ts.between(lo, hi)
+    for col, needle in (contains or {}).items():
+        if needle:
+            mask &= df[col].astype("string").str.contains(needle, case=False, regex=False, na=False)
+    return df.loc[mask]
+
+# ======================
+# READ SIDE (dipakai app.py)
+# ======================
+def session_timezone(conn) -> str:
+    """TimeZone session Postgres (zona yang dipakai BETWEEN tanggal, ::date, date_trunc)."""
+    name = conn.execute(text("SELECT current_setting('TimeZone')")).scalar()
+    try:
+        pd.Timestamp(0).tz_localize(name)
+    except Exception:
+        # zona POSIX mentah (mis. '<+07>-07') tidak dikenal pandas
+        return "UTC"
+    return name
+
+def has_archive(conn) -> bool:
+    return conn.execute(text("SELECT to_regclass(:t) IS NOT NULL"), {"t": BATCHES}).scalar()
+
+def batch_ids_for_range(conn, start: date, end: date) -> list:
+    """ID batch arsip yang bulannya beririsan dengan [start, end]."""
+    if not has_archive(conn):
+        return []
+    res = conn.execute(text(f"SELECT id FROM {BATCHES} WHERE month BETWEEN :ms AND :e ORDER BY id"),
+                       {"ms": start.replace(day=1), "e": end})
+    return [r[0] for r in res]
+
+def load_batches(conn, batch_ids, columns=None) -> pd.DataFrame:
+    """Dekompresi batch arsip menjadi satu DataFrame (semua kolom kalau `columns` None)."""
+    if not batch_ids:
+        return pd.DataFrame()
+    res = conn.execute(text(f"SELECT payload FROM {BATCHES} WHERE id = ANY(:ids) ORDER BY id"),
+                       {"ids": list(batch_ids)})
+    frames = [from_parquet_bytes(r[0], columns) for r in res]
+    frames = [f for f in frames if not f.empty]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+def summary_totals(conn, start: date, end: date) -> pd.Series:
+    """Total Summary Metrics dari rollup harian (granularitas hari, inklusif `end`)."""
+    zero = pd.Series(0.0, index=SUMMARY_COLS)
+    if not has_archive(conn):
+        return zero
+    df = pd.read_sql(text(f"""
+        SELECT {", ".join(f"COALESCE(SUM({c}),0) AS {c}" for c in SUMMARY_COLS)}
+        FROM {DAILY}
+        WHERE tx_date BETWEEN :s AND :e
+    """), conn, params={"s": start, "e": end})
+    return df.iloc[0].astype(float) if not df.empty else zero
+
+def recent_totals(conn, days: int = 7) -> pd.Series:
+    """Pasangan arsip untuk Quick Stats (`std_transaction_date >= CURRENT_DATE - N days`)."""
+    zero = pd.Series(0.0, index=["total_records", "total_amount"])
+    if not has_archive(conn):
+        return zero
+    df = pd.read_sql(text(f"""
+        SELECT
+          COALESCE(SUM(row_count),0) AS total_records,
+          COALESCE(SUM(sum_std_amount),0) AS total_amount
+        FROM {DAILY}
+        WHERE tx_date >= CURRENT_DATE - make_interval(days => :d)
+    """), conn, params={"d": days})
+    return df.iloc[0].astype(float) if not df.empty else zero
+
+def load_balance_points(conn) -> pd.DataFrame:
+    if not has_archive(conn):
+        return pd.DataFrame(columns=BALANCE_COLS)
+    df = pd.read_sql(text(f"SELECT {', '.join(BALANCE_COLS)} FROM {BALANCE}"), conn)
+    return merge_balance_points(df)
+
+def archived_keys(conn, column: str, keys) -> set:
+    """Subset `keys` yang sudah ada di arsip (column: std_identifier / tx_id)."""
+    if column not in ("std_identifier", "tx_id") or not keys or not has_archive(conn):
+        return set()
+    res = conn.execute(text(f"SELECT DISTINCT {column} FROM {KEYS} WHERE {column} = ANY(:k)"),
+                       {"k": list(keys)})
+    return {str(r[0]) for r in res}
+
+def archived_months(conn) -> set:
+    if not has_archive(conn):
+        return set()
+    return {r[0] for r in conn.execute(text(f"SELECT DISTINCT month FROM {BATCHES}"))}
+
+def archived_mask(conn, df: pd.DataFrame) -> pd.Series:
+    """True untuk baris upload yang masuk bulan arsip, atau std_identifier / tx_id-nya sudah diarsip."""
+    mask = pd.Series(False, index=df.index)
+    months = archived_months(conn)
+    if months and "std_transaction_date" in df.columns:
+        ts = pd.to_datetime(df["std_transaction_date"], errors="coerce")
+        if ts.dt.tz is not None:
+            # timestamp naive diartikan Postgres di TimeZone session; yang aware dikonversi dulu
+            ts = ts.dt.tz_convert(session_timezone(conn))
+        keys = {m.year * 100 + m.month for m in months}
+        mask |= (ts.dt.year * 100 + ts.dt.month).isin(keys).fillna(False).astype(bool)
+    for col in ("std_identifier", "tx_id"):
+        if col in df.columns:
+            vals = df[col].astype("string")
+            found = archived_keys(conn, col, vals.dropna().unique().tolist())
+            if found:
+                mask |= vals.isin(found).fillna(False).astype(bool)
+    return mask
+
+# ======================
+# WRITE SIDE (CLI)
+# ======================
+def ensure_archive(engine):
+    with engine.begin() as conn:
+        conn.execute(text(DDL))
+
+def closed_months(conn, cutoff: date) -> list:
+    res = conn.execute(text(f"""
+        SELECT DISTINCT date_trunc('month', std_transaction_date)::date AS m
+        FROM {HOT}
+        WHERE std_transaction_date < :cutoff
+        ORDER BY m
+    """), {"cutoff": cutoff})
+    return [r[0] for r in res]
+
+def archive_month(engine, month: date) -> int:
+    """Pindahkan satu bulan dari tabel utama ke arsip. Return jumlah baris."""
+    ms, me = month_bounds(month)
+    rng = "std_transaction_date >= :ms AND std_transaction_date < :me"
+    p = {"ms": ms, "me": me}
+    with engine.begin() as conn:
+        # cegah insert baru di rentang ini antara SELECT dan DELETE
+        conn.execute(text(f"LOCK TABLE {HOT} IN EXCLUSIVE MODE"))
+        rows = pd.read_sql(text(f"SELECT * FROM {HOT} WHERE {rng}"), conn, params=p)
+        if rows.empty:
+            return 0
+
+        batch_id = conn.execute(text(f"""
+            INSERT INTO {BATCHES} (month, row_count, payload)
+            VALUES (:m, :n, :payload) RETURNING id
+        """), {"m": ms, "n": len(rows), "payload": to_parquet_bytes(rows)}).scalar_one()
+
+        conn.execute(text(f"""
+            INSERT INTO {DAILY} (batch_id, month, tx_date, row_count, {", ".join(SUMMARY_COLS)})
+            SELECT :b, :ms, std_transaction_date::date, COUNT(*),
+                   COALESCE(SUM(std_amount),0), COALESCE(SUM(std_vendor_cost),0),
+                   COALESCE(SUM(std_admin_fee),0), COALESCE(SUM(std_admin_fee_invoice),0)
+            FROM {HOT}
+            WHERE {rng}
+            GROUP BY std_transaction_date::date
+        """), {**p, "b": batch_id})
+
+        points = daily_balance_points(rows)
+        if not points.empty:
+            points.assign(batch_id=batch_id, month=ms).to_sql(
+                "reconciliation_balance", conn, if_exists="append", index=False, schema=ARCHIVE_SCHEMA)
+
+        keys = rows.reindex(columns=["std_identifier", "tx_id"]).astype("string").astype(object)
+        keys = keys.where(keys.notna(), None)
+        keys.assign(batch_id=batch_id, month=ms).to_sql(
+            "reconciliation_keys", conn, if_exists="append", index=False, schema=ARCHIVE_SCHEMA)
+
+        conn.execute(text(f"DELETE FROM {HOT} WHERE {rng}"), p)
+    return len(rows)
+
+def restore_month(engine, month: date) -> int:
+    """Kembalikan semua batch satu bulan ke tabel utama. Return jumlah baris."""
+    ms, _ = month_bounds(month)
+    with engine.begin() as conn:
+        ids = [r[0] for r in conn.execute(text(f"SELECT id FROM {BATCHES} WHERE month = :m ORDER BY id"), {"m": ms})]
+        if not ids:
+            return 0
+        rows = load_batches(conn, ids)
+        if not rows.empty:
+            rows.to_sql("reconciliation", conn, if_exists="append", index=False, schema=SCHEMA)
+        # daily/balance/keys ikut terhapus (ON DELETE CASCADE)
+        conn.execute(text(f"DELETE FROM {BATCHES} WHERE id = ANY(:ids)"), {"ids": ids})
+    return len(rows)
+
+def list_archive(engine) -> pd.DataFrame:
+    with engine.connect() as conn:
+        if not has_archive(conn):
+            return pd.DataFrame()
+        return pd.read_sql(text(f"""
+            SELECT month, COUNT(*) AS batches, SUM(row_count) AS row_count,
+                   SUM(octet_length(payload)) AS payload_bytes, MAX(archived_at) AS last_archived_at
+            FROM {BATCHES}
+            GROUP BY month
+            ORDER BY month
+        """), conn)
+
+def main():
+    parser = argparse.ArgumentParser(description="Arsipkan bulan lama reconciliation ke cold store.")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--before", metavar="YYYY-MM", type=parse_month,
+                      help="arsipkan semua bulan sebelum YYYY-MM (default: sisakan ARCHIVE_KEEP_MONTHS)")
+    mode.add_argument("--restore", metavar="YYYY-MM", type=parse_month, help="kembalikan satu bulan ke tabel utama")
+    mode.add_argument("--list", action="store_true", help="tampilkan isi arsip")
+    args = parser.parse_args()
+
+    # hanya bulan yang sudah ditutup: bulan berjalan & tanggal masa depan tetap di tabel utama
+    current_month = date.today().replace(day=1)
+    if args.before and args.before > current_month:
+        parser.error(f"--before {args.before:%Y-%m} melewati bulan berjalan; maksimal {current_month:%Y-%m}")
+
+    engine = create_engine(
+        f"postgresql+psycopg2://{config.DB_USER}:{config.DB_PASS}"
+        f"@{config.DB_HOST}:{config.DB_PORT}/{config.DB_NAME}"
+    )
+
+    if args.list:
+        print(list_archive(engine).to_string(index=False))
+        return
+
+    ensure_archive(engine)
+
+    if args.restore:
+        print(f"↩️  {args.restore:%Y-%m}: restored {restore_month(engine, args.restore):,} rows to {HOT}.")
+        return
+
+    cutoff = args.before or min(default_cutoff(), current_month)
+    with engine.connect() as conn:
+        months = closed_months(conn, cutoff)
+    if not months:
+        print(f"Tidak ada bulan sebelum {cutoff:%Y-%m} untuk diarsipkan.")
+    for m in months:
+        print(f"📦 {m:%Y-%m}: archived {archive_month(engine, m):,} rows to {BATCHES}.")
+
+if __name__ == "__main__":
+    main()
@@ -7,3 +7,11 @@ DB_NAME = "postgres"
 
 # >>> Ubah ini kalau mau pakai schema lain, mis. "reconku"
 DB_SCHEMA = "reconku"   # ganti ke "reconku" kalau mau
+
+# Cold store untuk bulan lama (lihat archive.py)
+ARCHIVE_SCHEMA = "reconku_archive"
+# Jumlah bulan terakhir yang tetap di tabel utama. Trade-off: Dashboard & Analytics default
+# mulai 2025-01-01, jadi bulan arsip di rentang itu tetap dibaca dari cold store
+# (didekompresi sekali per batch lalu di-cache). Kalau tampilan default harus
+# full-hot, pakai `python archive.py --before 2025-01` daripada default ini.
+ARCHIVE_KEEP_MONTHS = 3